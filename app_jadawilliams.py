@@ -1,11 +1,19 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
 import numpy as np
 import sqlite3
+import os
+import re
 import plotly.express as px
 import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from io import BytesIO
 from PIL import Image
 
@@ -17,44 +25,41 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 3rem;
-        font-weight: bold;
-        color: #1D428A;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .metric-card {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        padding: 20px;
-        border-radius: 10px;
-        color: white;
-        text-align: center;
-    }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 24px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        padding: 0 24px;
-        background-color: #f0f2f6;
-        border-radius: 5px;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS (read from disk once per process, not on every rerun)
+@st.cache_resource
+def load_css():
+    """Load the app stylesheet wrapped in a <style> tag"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")) as f:
+        return f"<style>{f.read()}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # ============================================================================
 # DATABASE INITIALIZATION
 # ============================================================================
 
+# Player value index (0-100), materialized into performance_stats.value_index
+VALUE_INDEX_SQL = """
+    ROUND(MIN(points_per_game / 35.0, 1) * 30
+          + MIN(per / 35.0, 1) * 25
+          + MIN(win_shares / 15.0, 1) * 20
+          + (field_goal_pct / 60.0) * 15
+          + (games_played / 82.0) * 10, 1)
+"""
+
 def init_database():
     """Initialize SQLite database with NBA data"""
     conn = sqlite3.connect('nba_contracts.db', check_same_thread=False)
     cursor = conn.cursor()
     
+    # WAL lets the cached readers run alongside writes; NORMAL sync is safe under WAL
+    cursor.executescript('''
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA cache_size=-64000;
+        PRAGMA temp_store=MEMORY;
+    ''')
+    
     # Create Players table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS players (
@@ -103,6 +108,7 @@ def init_database():
             usage_rate REAL,
             win_shares REAL,
             per REAL,
+            value_index REAL,
             FOREIGN KEY (player_id) REFERENCES players(player_id)
         )
     ''')
@@ -135,6 +141,36 @@ def init_database():
         )
     ''')
     
+    # Databases created before value_index was materialized need the column added
+    cursor.execute("PRAGMA table_info(performance_stats)")
+    if 'value_index' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE performance_stats ADD COLUMN value_index REAL")
+    cursor.execute(f"UPDATE performance_stats SET value_index = {VALUE_INDEX_SQL} WHERE value_index IS NULL")
+    
+    # SQLite does not index foreign keys on its own; the player joins need these
+    cursor.executescript('''
+        CREATE INDEX IF NOT EXISTS idx_stats_pid ON performance_stats(player_id);
+        CREATE INDEX IF NOT EXISTS idx_contracts_pid ON contracts(player_id);
+        CREATE INDEX IF NOT EXISTS idx_injuries_pid ON injuries(player_id);
+        CREATE INDEX IF NOT EXISTS idx_contracts_team ON contracts(team);
+        CREATE INDEX IF NOT EXISTS idx_players_position ON players(position);
+        CREATE INDEX IF NOT EXISTS idx_players_team ON players(team);
+        CREATE INDEX IF NOT EXISTS idx_stats_value_index ON performance_stats(value_index);
+    ''')
+    
+    # Player/contract value view so top-N rankings can be answered in SQL
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS player_value AS
+        SELECT p.player_id, p.name, p.team, p.position, ps.points_per_game,
+               ps.value_index, c.annual_salary
+        FROM players p
+        JOIN performance_stats ps ON p.player_id = ps.player_id
+        JOIN contracts c ON p.player_id = c.player_id
+    ''')
+    
+    # Refresh planner statistics so SQLite picks the indexes over full scans
+    cursor.execute("ANALYZE")
+    
     conn.commit()
     return conn
 
@@ -170,29 +206,27 @@ def load_sample_data(conn):
         (1629027, 'Trae Young', 'PG', 'Atlanta Hawks', 26, '6-1', 164, 6, 2018, 5),
     ]
     
-    cursor.executemany('INSERT OR IGNORE INTO players VALUES (?,?,?,?,?,?,?,?,?,?)', players)
-    
-    # Sample Contracts
-    contracts = []
-    for player_id, name, pos, team, age, ht, wt, yrs, draft_yr, draft_pos in players:
-        # Generate realistic contract values
-        if age < 26:
-            salary = np.random.uniform(25, 40)
-        elif age < 30:
-            salary = np.random.uniform(35, 52)
-        else:
-            salary = np.random.uniform(30, 48)
-        
-        start_date = '2023-07-01'
-        end_date = '2027-06-30'
-        total_value = salary * 4
-        
-        contracts.append((player_id, team, start_date, end_date, total_value, salary, 'Max Contract'))
-    
-    cursor.executemany('''
-        INSERT INTO contracts (player_id, team, start_date, end_date, total_value, annual_salary, contract_type)
-        VALUES (?,?,?,?,?,?,?)
-    ''', contracts)
+    # Sample Contracts, derived column-wise from the player list
+    players_df = pd.DataFrame(players, columns=['player_id', 'name', 'position', 'team', 'age', 'height',
+                                                'weight', 'years_in_league', 'draft_year', 'draft_position'])
+    n_players = len(players_df)
+    
+    # Generate realistic contract values by age bracket
+    salary = np.where(players_df['age'] < 26, np.random.uniform(25, 40, n_players),
+                      np.where(players_df['age'] < 30, np.random.uniform(35, 52, n_players),
+                               np.random.uniform(30, 48, n_players)))
+    
+    contracts_df = pd.DataFrame({
+        'player_id': players_df['player_id'],
+        'team': players_df['team'],
+        'start_date': '2023-07-01',
+        'end_date': '2027-06-30',
+        'total_value': salary * 4,
+        'annual_salary': salary,
+        'contract_type': 'Max Contract',
+    })
+    # to_records().tolist() yields plain Python scalars, which sqlite3 can bind
+    contracts = contracts_df.to_records(index=False).tolist()
     
     # Sample Performance Stats (2023-24 season)
     stats = [
@@ -213,13 +247,6 @@ def load_sample_data(conn):
         (1629027, '2023-24', 54, 36.2, 25.7, 2.8, 10.8, 43.0, 37.3, 86.0, 32.5, 5.7, 24.1),
     ]
     
-    cursor.executemany('''
-        INSERT INTO performance_stats (player_id, season, games_played, minutes_per_game, 
-        points_per_game, rebounds_per_game, assists_per_game, field_goal_pct, 
-        three_point_pct, free_throw_pct, usage_rate, win_shares, per)
-        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-    ''', stats)
-    
     # Sample Injuries
     injuries = [
         (2544, 'Ankle Sprain', '2024-01-15', '2024-02-01', 8, False),
@@ -228,11 +255,6 @@ def load_sample_data(conn):
         (203081, 'Calf Strain', '2024-01-20', '2024-02-28', 18, False),
     ]
     
-    cursor.executemany('''
-        INSERT INTO injuries (player_id, injury_type, injury_date, return_date, games_missed, recurring)
-        VALUES (?,?,?,?,?,?)
-    ''', injuries)
-    
     # Sample Teams
     teams = [
         ('Los Angeles Lakers', 'Los Angeles', 'Western', 'Pacific', 178.5, -38.5, 'Over Cap'),
@@ -242,46 +264,84 @@ def load_sample_data(conn):
         ('Dallas Mavericks', 'Dallas', 'Western', 'Southwest', 155.8, -15.8, 'Under Cap'),
     ]
     
-    cursor.executemany('''
-        INSERT INTO teams (team_name, city, conference, division, current_payroll, salary_cap_space, luxury_tax_status)
-        VALUES (?,?,?,?,?,?,?)
-    ''', teams)
+    # Seeding is rerunnable from scratch, so skip fsyncs until it has committed
+    cursor.execute("PRAGMA synchronous=OFF")
     
-    conn.commit()
+    try:
+        # Insert everything in one transaction so the seed costs a single commit
+        with conn:
+            cursor.executemany('INSERT OR IGNORE INTO players VALUES (?,?,?,?,?,?,?,?,?,?)', players)
+            
+            cursor.executemany('''
+                INSERT INTO contracts (player_id, team, start_date, end_date, total_value, annual_salary, contract_type)
+                VALUES (?,?,?,?,?,?,?)
+            ''', contracts)
+            
+            cursor.executemany('''
+                INSERT INTO performance_stats (player_id, season, games_played, minutes_per_game, 
+                points_per_game, rebounds_per_game, assists_per_game, field_goal_pct, 
+                three_point_pct, free_throw_pct, usage_rate, win_shares, per)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+            ''', stats)
+            cursor.execute(f"UPDATE performance_stats SET value_index = {VALUE_INDEX_SQL}")
+            
+            cursor.executemany('''
+                INSERT INTO injuries (player_id, injury_type, injury_date, return_date, games_missed, recurring)
+                VALUES (?,?,?,?,?,?)
+            ''', injuries)
+            
+            cursor.executemany('''
+                INSERT INTO teams (team_name, city, conference, division, current_payroll, salary_cap_space, luxury_tax_status)
+                VALUES (?,?,?,?,?,?,?)
+            ''', teams)
+    finally:
+        # Restore durable writes even if the seed fails; the connection is shared
+        cursor.execute("PRAGMA synchronous=NORMAL")
+
+@st.cache_resource
+def init_and_seed():
+    """Open the database and load sample data once per process"""
+    conn = init_database()
+    load_sample_data(conn)
+    return conn
 
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
 
+# Shared HTTP session so headshot fetches reuse pooled keep-alive connections
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32,
+                                      max_retries=Retry(total=2, backoff_factor=0.2)))
+
+@st.cache_data(max_entries=512, ttl=86400, show_spinner=False)
+def _load_player_image(player_id):
+    """Download a player headshot from NBA.com; raises on failure so misses are not cached"""
+    url = f"https://ak-static.cms.nba.com/wp-content/uploads/headshots/nba/latest/260x190/{player_id}.png"
+    response = _session.get(url, timeout=3)
+    response.raise_for_status()
+    return Image.open(BytesIO(response.content))
+
 def get_player_image(player_id):
     """Fetch player image from NBA.com"""
-    url = f"https://ak-static.cms.nba.com/wp-content/uploads/headshots/nba/latest/260x190/{player_id}.png"
     try:
-        response = requests.get(url, timeout=3)
-        if response.status_code == 200:
-            return Image.open(BytesIO(response.content))
+        return _load_player_image(player_id)
     except:
-        pass
-    return None
-
-def calculate_value_index(row):
-    """Calculate player value index (0-100)"""
-    # Normalize stats
-    ppg_norm = min(row['points_per_game'] / 35, 1) * 30
-    per_norm = min(row['per'] / 35, 1) * 25
-    ws_norm = min(row['win_shares'] / 15, 1) * 20
-    efficiency = (row['field_goal_pct'] / 60) * 15
-    availability = (row['games_played'] / 82) * 10
-    
-    value = ppg_norm + per_norm + ws_norm + efficiency + availability
-    return round(value, 1)
-
-def calculate_contract_efficiency(stats_df, contracts_df):
-    """Calculate contract efficiency rating"""
-    merged = pd.merge(stats_df, contracts_df, on='player_id')
-    merged['value_index'] = merged.apply(calculate_value_index, axis=1)
-    merged['efficiency_rating'] = (merged['value_index'] / merged['annual_salary']) * 10
-    return merged
+        return None
+
+def get_player_images(player_ids):
+    """Fetch several player images concurrently, keyed by player_id"""
+    # Workers need the script context to read and fill the per-player cache
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(max_workers=10, initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+        return dict(zip(player_ids, executor.map(get_player_image, player_ids)))
+
+def sample_for_scatter(df, rank_col, keep_top=50, sample_size=500):
+    """Thin out a large scatter: keep the top rows by rank_col plus a fixed random sample"""
+    if len(df) <= keep_top + sample_size:
+        return df
+    sampled = pd.concat([df.nlargest(keep_top, rank_col), df.sample(sample_size, random_state=0)])
+    return sampled[~sampled.index.duplicated()]
 
 # ============================================================================
 # DATABASE QUERY FUNCTIONS
@@ -312,25 +372,127 @@ def get_teams(_conn):
     """Get team data"""
     return pd.read_sql_query("SELECT * FROM teams", _conn)
 
+@st.cache_data
+def get_merged_df(_conn):
+    """Get players joined with their stats and contracts"""
+    players_df = get_all_players(_conn)
+    stats_df = get_player_stats(_conn)
+    # Keep the roster team from players; the contract's team would otherwise split into team_x/team_y
+    contracts_df = get_contracts(_conn).drop(columns='team')
+    merged_df = players_df.merge(stats_df, on='player_id').merge(contracts_df, on='player_id')
+    merged_df['efficiency_rating'] = (merged_df['value_index'] / merged_df['annual_salary']) * 10
+    
+    # Narrower numeric dtypes halve the bytes every filter, reduction and groupby has to scan
+    numeric_downcast = {
+        'age': 'int16', 'years_in_league': 'int8', 'draft_year': 'int16', 'draft_position': 'int16',
+        'games_played': 'int16', 'points_per_game': 'float32', 'rebounds_per_game': 'float32',
+        'assists_per_game': 'float32', 'field_goal_pct': 'float32', 'per': 'float32',
+        'win_shares': 'float32', 'annual_salary': 'float32', 'total_value': 'float32'
+    }
+    merged_df = merged_df.astype({col: dtype for col, dtype in numeric_downcast.items() if col in merged_df.columns})
+    
+    # Low-cardinality labels as categories: masks, value_counts and groupby work on integer codes
+    for col in ('position', 'team', 'contract_type'):
+        merged_df[col] = merged_df[col].astype('category')
+    return merged_df
+
+@st.cache_data
+def get_merged_by_name(_conn):
+    """Get the merged player data indexed by player name (first row per player)"""
+    return get_merged_df(_conn).drop_duplicates('name').set_index('name')
+
+@st.cache_data
+def get_player_name_index(_conn):
+    """Get a name -> {'player_id', 'team'} lookup for the player pickers"""
+    return get_all_players(_conn).set_index('name')[['player_id', 'team']].to_dict('index')
+
+@st.cache_data
+def get_position_stats(_conn):
+    """Get average stats, salary and value index by position"""
+    # Widen back to float64 so the rounded float32 means display without float noise
+    return get_merged_df(_conn).groupby('position', observed=True).agg({
+        'points_per_game': 'mean',
+        'rebounds_per_game': 'mean',
+        'assists_per_game': 'mean',
+        'annual_salary': 'mean',
+        'value_index': 'mean'
+    }).astype('float64').round(2)
+
+@st.cache_data
+def get_position_counts(_conn):
+    """Get number of players by position"""
+    return get_merged_df(_conn)['position'].value_counts()
+
+@st.cache_data
+def get_top_performers(_conn, limit=5):
+    """Get the highest value-index players"""
+    query = """
+        SELECT name, team, value_index, points_per_game
+        FROM player_value
+        ORDER BY value_index DESC, player_id
+        LIMIT ?
+    """
+    return pd.read_sql_query(query, _conn, params=(limit,))
+
+@st.cache_data
+def get_highest_paid(_conn, limit=5):
+    """Get the highest-salaried players"""
+    query = """
+        SELECT name, team, annual_salary, value_index
+        FROM player_value
+        ORDER BY annual_salary DESC, player_id
+        LIMIT ?
+    """
+    return pd.read_sql_query(query, _conn, params=(limit,))
+
+@st.cache_data(max_entries=128, ttl=600)
+def get_filtered_players(_conn, name=None, position=None, team=None):
+    """Get merged player rows matching the given filters, filtered in SQL"""
+    sql = ["""
+        SELECT p.*, ps.stat_id, ps.season, ps.games_played, ps.minutes_per_game,
+               ps.points_per_game, ps.rebounds_per_game, ps.assists_per_game,
+               ps.field_goal_pct, ps.three_point_pct, ps.free_throw_pct, ps.usage_rate,
+               ps.win_shares, ps.per, ps.value_index, c.contract_id, c.start_date,
+               c.end_date, c.total_value, c.annual_salary, c.contract_type
+        FROM players p
+        JOIN performance_stats ps ON p.player_id = ps.player_id
+        JOIN contracts c ON p.player_id = c.player_id
+        WHERE 1=1
+    """]
+    params = []
+    if name:
+        # Plain substring match: escape LIKE wildcards typed by the user
+        escaped = name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        sql.append("AND p.name LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    if position:
+        sql.append("AND p.position = ?")
+        params.append(position)
+    if team:
+        sql.append("AND p.team = ?")
+        params.append(team)
+    sql.append("ORDER BY p.player_id, ps.stat_id, c.contract_id")
+    return pd.read_sql_query(" ".join(sql), _conn, params=params)
+
+@st.cache_data(ttl=600)
 def get_player_details(_conn, player_id):
     """Get detailed player information"""
-    query = f"""
+    query = """
         SELECT p.*, ps.*, c.annual_salary, c.contract_type, c.end_date
         FROM players p
         LEFT JOIN performance_stats ps ON p.player_id = ps.player_id
         LEFT JOIN contracts c ON p.player_id = c.player_id
-        WHERE p.player_id = {player_id}
+        WHERE p.player_id = ?
     """
-    return pd.read_sql_query(query, _conn)
+    return pd.read_sql_query(query, _conn, params=(int(player_id),))
 
 # ============================================================================
 # MAIN APP
 # ============================================================================
 
 def main():
-    # Initialize database
-    conn = init_database()
-    load_sample_data(conn)
+    # Initialize database (cached, so reruns skip schema setup and the seed check)
+    conn = init_and_seed()
     
     # Sidebar
     st.sidebar.image("https://cdn.nba.com/logos/leagues/logo-nba.svg", width=100)
@@ -370,15 +532,10 @@ def main():
 def show_dashboard(conn):
     st.markdown('<h1 class="main-header">🏀 NBA Contract Analytics Dashboard</h1>', unsafe_allow_html=True)
     
-    # Load data
-    players_df = get_all_players(conn)
-    stats_df = get_player_stats(conn)
-    contracts_df = get_contracts(conn)
-    
-    # Merge data
-    merged_df = pd.merge(players_df, stats_df, on='player_id')
-    merged_df = pd.merge(merged_df, contracts_df, on='player_id')
-    merged_df['value_index'] = merged_df.apply(calculate_value_index, axis=1)
+    # Load merged data; the top-5 tables are ranked in SQL
+    merged_df = get_merged_df(conn)
+    top_performers = get_top_performers(conn)
+    top_paid = get_highest_paid(conn)
     
     # Top metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -388,7 +545,7 @@ def show_dashboard(conn):
     with col2:
         st.metric("Avg Contract Value", f"${merged_df['annual_salary'].mean():.1f}M")
     with col3:
-        st.metric("Top Performer", merged_df.loc[merged_df['value_index'].idxmax(), 'name'])
+        st.metric("Top Performer", top_performers.at[0, 'name'])
     with col4:
         avg_value = merged_df['value_index'].mean()
         st.metric("Avg Value Index", f"{avg_value:.1f}")
@@ -400,14 +557,15 @@ def show_dashboard(conn):
     
     with col1:
         st.subheader("🌟 Top 5 Performers by Value Index")
-        top_performers = merged_df.nlargest(5, 'value_index')[['name', 'team', 'value_index', 'points_per_game']]
         st.dataframe(top_performers, hide_index=True, use_container_width=True)
     
     with col2:
         st.subheader("💰 Highest Paid Players")
-        top_paid = merged_df.nlargest(5, 'annual_salary')[['name', 'team', 'annual_salary', 'value_index']]
-        top_paid['annual_salary'] = top_paid['annual_salary'].apply(lambda x: f"${x:.1f}M")
-        st.dataframe(top_paid, hide_index=True, use_container_width=True)
+        st.dataframe(
+            top_paid.style.format({'annual_salary': '${:.1f}M'}),
+            hide_index=True,
+            use_container_width=True
+        )
     
     st.markdown("---")
     
@@ -416,8 +574,12 @@ def show_dashboard(conn):
     
     with col1:
         st.subheader("📈 Performance vs Salary")
+        plot_df = merged_df[['annual_salary', 'value_index', 'points_per_game', 'position', 'name', 'team']]
+        plot_df = sample_for_scatter(plot_df, 'value_index')
+        # Plotly groups by the colour column; a categorical there triggers pandas' observed= FutureWarning
+        plot_df = plot_df.astype({'position': str})
         fig = px.scatter(
-            merged_df,
+            plot_df,
             x='annual_salary',
             y='value_index',
             size='points_per_game',
@@ -430,7 +592,7 @@ def show_dashboard(conn):
     
     with col2:
         st.subheader("🎯 Position Distribution")
-        position_counts = merged_df['position'].value_counts()
+        position_counts = get_position_counts(conn)
         fig = px.pie(
             values=position_counts.values,
             names=position_counts.index,
@@ -445,14 +607,8 @@ def show_dashboard(conn):
 def show_player_database(conn):
     st.title("👤 Player Database")
     
-    players_df = get_all_players(conn)
-    stats_df = get_player_stats(conn)
-    contracts_df = get_contracts(conn)
-    
-    # Merge data
-    full_df = pd.merge(players_df, stats_df, on='player_id')
-    full_df = pd.merge(full_df, contracts_df, on='player_id')
-    full_df['value_index'] = full_df.apply(calculate_value_index, axis=1)
+    # Load merged data
+    full_df = get_merged_df(conn)
     
     # Search and filters
     col1, col2, col3 = st.columns(3)
@@ -464,26 +620,35 @@ def show_player_database(conn):
     with col3:
         filter_team = st.selectbox("Team", ["All"] + sorted(full_df['team'].unique().tolist()))
     
-    # Apply filters
-    filtered_df = full_df.copy()
-    if search_name:
-        filtered_df = filtered_df[filtered_df['name'].str.contains(search_name, case=False)]
-    if filter_position != "All":
-        filtered_df = filtered_df[filtered_df['position'] == filter_position]
-    if filter_team != "All":
-        filtered_df = filtered_df[filtered_df['team'] == filter_team]
+    # Apply filters in SQL so only matching rows are loaded
+    filtered_df = get_filtered_players(
+        conn,
+        name=search_name or None,
+        position=None if filter_position == "All" else filter_position,
+        team=None if filter_team == "All" else filter_team
+    )
     
     st.markdown("---")
     
     # Display player cards
     st.subheader(f"📋 Players ({len(filtered_df)} found)")
     
-    for idx, row in filtered_df.iterrows():
-        with st.expander(f"**{row['name']}** - {row['position']} | {row['team']}"):
+    # Paginate so each rerun only builds one page of cards
+    page_size = 20
+    n_pages = max(1, -(-len(filtered_df) // page_size))
+    page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+    page_df = filtered_df.iloc[(page - 1) * page_size:page * page_size]
+    
+    # Fetch the page's headshots up front so the downloads overlap instead of running per card
+    images = get_player_images(tuple(int(pid) for pid in page_df['player_id']))
+    avg_value_index = full_df['value_index'].mean()
+    
+    for row in page_df.itertuples(index=False):
+        with st.expander(f"**{row.name}** - {row.position} | {row.team}"):
             col1, col2, col3 = st.columns([1, 2, 2])
             
             with col1:
-                img = get_player_image(row['player_id'])
+                img = images.get(row.player_id)
                 if img:
                     st.image(img, use_container_width=True)
                 else:
@@ -491,26 +656,26 @@ def show_player_database(conn):
             
             with col2:
                 st.markdown("**Personal Info**")
-                st.write(f"Age: {row['age']}")
-                st.write(f"Height: {row['height']}")
-                st.write(f"Weight: {row['weight']} lbs")
-                st.write(f"Experience: {row['years_in_league']} years")
-                st.write(f"Draft: {row['draft_year']} (Pick #{row['draft_position']})")
+                st.write(f"Age: {row.age}")
+                st.write(f"Height: {row.height}")
+                st.write(f"Weight: {row.weight} lbs")
+                st.write(f"Experience: {row.years_in_league} years")
+                st.write(f"Draft: {row.draft_year} (Pick #{row.draft_position})")
             
             with col3:
                 st.markdown("**2023-24 Stats**")
-                st.write(f"PPG: {row['points_per_game']:.1f}")
-                st.write(f"RPG: {row['rebounds_per_game']:.1f}")
-                st.write(f"APG: {row['assists_per_game']:.1f}")
-                st.write(f"FG%: {row['field_goal_pct']:.1f}%")
-                st.write(f"PER: {row['per']:.1f}")
+                st.write(f"PPG: {row.points_per_game:.1f}")
+                st.write(f"RPG: {row.rebounds_per_game:.1f}")
+                st.write(f"APG: {row.assists_per_game:.1f}")
+                st.write(f"FG%: {row.field_goal_pct:.1f}%")
+                st.write(f"PER: {row.per:.1f}")
             
             col1, col2 = st.columns(2)
             with col1:
-                st.metric("Annual Salary", f"${row['annual_salary']:.1f}M")
+                st.metric("Annual Salary", f"${row.annual_salary:.1f}M")
             with col2:
-                st.metric("Value Index", f"{row['value_index']:.1f}", 
-                         delta=f"{row['value_index'] - full_df['value_index'].mean():.1f} vs avg")
+                st.metric("Value Index", f"{row.value_index:.1f}", 
+                         delta=f"{row.value_index - avg_value_index:.1f} vs avg")
 
 # ============================================================================
 # PAGE: ANALYTICS
@@ -519,24 +684,20 @@ def show_player_database(conn):
 def show_analytics(conn):
     st.title("📊 Advanced Analytics")
     
-    players_df = get_all_players(conn)
-    stats_df = get_player_stats(conn)
-    contracts_df = get_contracts(conn)
-    
-    # Merge data
-    full_df = pd.merge(players_df, stats_df, on='player_id')
-    full_df = pd.merge(full_df, contracts_df, on='player_id')
-    full_df['value_index'] = full_df.apply(calculate_value_index, axis=1)
-    full_df['efficiency_rating'] = (full_df['value_index'] / full_df['annual_salary']) * 10
+    # Load merged data
+    full_df = get_merged_df(conn)
     
     tab1, tab2, tab3 = st.tabs(["💎 Value Analysis", "📈 Performance Trends", "🎯 Position Comparison"])
     
     with tab1:
         st.subheader("Contract Efficiency Analysis")
         
-        # Efficiency scatter
+        # Efficiency scatter (only the plotted columns)
+        plot_df = full_df[['annual_salary', 'value_index', 'points_per_game', 'efficiency_rating',
+                           'name', 'team', 'position']]
+        plot_df = sample_for_scatter(plot_df, 'value_index')
         fig = px.scatter(
-            full_df,
+            plot_df,
             x='annual_salary',
             y='value_index',
             size='points_per_game',
@@ -553,16 +714,20 @@ def show_analytics(conn):
         with col1:
             st.markdown("**🔥 Best Value Contracts**")
             best_value = full_df.nlargest(5, 'efficiency_rating')[['name', 'annual_salary', 'value_index', 'efficiency_rating']]
-            best_value['annual_salary'] = best_value['annual_salary'].apply(lambda x: f"${x:.1f}M")
-            best_value['efficiency_rating'] = best_value['efficiency_rating'].apply(lambda x: f"{x:.2f}")
-            st.dataframe(best_value, hide_index=True, use_container_width=True)
+            st.dataframe(
+                best_value.style.format({'annual_salary': '${:.1f}M', 'efficiency_rating': '{:.2f}'}),
+                hide_index=True,
+                use_container_width=True
+            )
         
         with col2:
             st.markdown("**⚠️ Overvalued Contracts**")
             worst_value = full_df.nsmallest(5, 'efficiency_rating')[['name', 'annual_salary', 'value_index', 'efficiency_rating']]
-            worst_value['annual_salary'] = worst_value['annual_salary'].apply(lambda x: f"${x:.1f}M")
-            worst_value['efficiency_rating'] = worst_value['efficiency_rating'].apply(lambda x: f"{x:.2f}")
-            st.dataframe(worst_value, hide_index=True, use_container_width=True)
+            st.dataframe(
+                worst_value.style.format({'annual_salary': '${:.1f}M', 'efficiency_rating': '{:.2f}'}),
+                hide_index=True,
+                use_container_width=True
+            )
     
     with tab2:
         st.subheader("Performance Metrics Distribution")
@@ -571,18 +736,19 @@ def show_analytics(conn):
                              ['points_per_game', 'rebounds_per_game', 'assists_per_game', 
                               'field_goal_pct', 'per', 'win_shares'])
         
-        fig = px.histogram(
-            full_df,
-            x=metric,
-            nbins=20,
+        # Bin in NumPy and send only the 20 bar heights to the browser
+        counts, edges = np.histogram(full_df[metric].dropna().to_numpy(), bins=20)
+        fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges)))
+        fig.update_layout(
             title=f'{metric.replace("_", " ").title()} Distribution',
-            labels={metric: metric.replace("_", " ").title()}
+            xaxis_title=metric.replace("_", " ").title(),
+            yaxis_title='count'
         )
         st.plotly_chart(fig, use_container_width=True)
         
         # Box plot by position
         fig = px.box(
-            full_df,
+            full_df[['position', metric]].astype({'position': str}),
             x='position',
             y=metric,
             title=f'{metric.replace("_", " ").title()} by Position',
@@ -594,19 +760,14 @@ def show_analytics(conn):
         st.subheader("Position-Based Analysis")
         
         # Average stats by position
-        position_stats = full_df.groupby('position').agg({
-            'points_per_game': 'mean',
-            'rebounds_per_game': 'mean',
-            'assists_per_game': 'mean',
-            'annual_salary': 'mean',
-            'value_index': 'mean'
-        }).round(2)
+        position_stats = get_position_stats(conn)
         
         st.dataframe(position_stats, use_container_width=True)
         
         # Radar chart for selected player
-        selected_player = st.selectbox("Select Player for Radar Chart", full_df['name'].tolist())
-        player_data = full_df[full_df['name'] == selected_player].iloc[0]
+        by_name = get_merged_by_name(conn)
+        selected_player = st.selectbox("Select Player for Radar Chart", by_name.index.tolist())
+        player_data = by_name.loc[selected_player]
         
         categories = ['PPG', 'RPG', 'APG', 'FG%', 'PER']
         values = [
@@ -672,14 +833,15 @@ def show_contract_manager(conn):
     with tab2:
         st.subheader("Add New Contract")
         
-        players_df = get_all_players(conn)
+        name_index = get_player_name_index(conn)
         
         col1, col2 = st.columns(2)
         
         with col1:
-            selected_player_name = st.selectbox("Select Player", players_df['name'].tolist())
-            player_id = players_df[players_df['name'] == selected_player_name]['player_id'].values[0]
-            team = st.text_input("Team", players_df[players_df['name'] == selected_player_name]['team'].values[0])
+            selected_player_name = st.selectbox("Select Player", list(name_index))
+            player_info = name_index[selected_player_name]
+            player_id = player_info['player_id']
+            team = st.text_input("Team", player_info['team'])
             contract_type = st.selectbox("Contract Type", 
                                         ["Max Contract", "Veteran Extension", "Rookie Contract", 
                                          "Mid-Level Exception", "Minimum Contract"])
@@ -694,12 +856,12 @@ def show_contract_manager(conn):
             st.write(f"**Total Value:** ${total_value:.1f}M")
         
         if st.button("💾 Save Contract", type="primary"):
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO contracts (player_id, team, start_date, end_date, total_value, annual_salary, contract_type)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (int(player_id), team, str(start_date), str(end_date), total_value, annual_salary, contract_type))
-            conn.commit()
+            # Commits on success and rolls back on error, keeping the shared connection clean
+            with conn:
+                conn.execute('''
+                    INSERT INTO contracts (player_id, team, start_date, end_date, total_value, annual_salary, contract_type)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (int(player_id), team, str(start_date), str(end_date), total_value, annual_salary, contract_type))
             st.success(f"✅ Contract added for {selected_player_name}!")
             st.cache_data.clear()
             st.rerun()
@@ -758,8 +920,9 @@ def show_injury_tracker(conn):
         col1, col2 = st.columns(2)
         
         with col1:
-            selected_player = st.selectbox("Player", players_df['name'].tolist())
-            player_id = players_df[players_df['name'] == selected_player]['player_id'].values[0]
+            name_index = get_player_name_index(conn)
+            selected_player = st.selectbox("Player", list(name_index))
+            player_id = name_index[selected_player]['player_id']
             injury_type = st.text_input("Injury Type", "Ankle Sprain")
             injury_date = st.date_input("Injury Date", datetime.now())
         
@@ -769,12 +932,12 @@ def show_injury_tracker(conn):
             recurring = st.checkbox("Recurring Injury")
         
         if st.button("💾 Save Injury Record", type="primary"):
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO injuries (player_id, injury_type, injury_date, return_date, games_missed, recurring)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (int(player_id), injury_type, str(injury_date), str(return_date), games_missed, recurring))
-            conn.commit()
+            # Commits on success and rolls back on error, keeping the shared connection clean
+            with conn:
+                conn.execute('''
+                    INSERT INTO injuries (player_id, injury_type, injury_date, return_date, games_missed, recurring)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (int(player_id), injury_type, str(injury_date), str(return_date), games_missed, recurring))
             st.success("✅ Injury record added!")
             st.cache_data.clear()
             st.rerun()
@@ -808,18 +971,23 @@ def show_sql_chat(conn):
         if user_query:
             with st.spinner("Translating and executing query..."):
                 # Simple query translation (in production, use LLM)
-                sql_query = translate_natural_to_sql(user_query)
+                sql_query, params = translate_natural_to_sql(user_query)
                 
                 st.code(sql_query, language='sql')
+                if params:
+                    st.caption(f"Parameters: {params}")
                 
                 try:
-                    result_df = pd.read_sql_query(sql_query, conn)
+                    result_df = pd.read_sql_query(sql_query, conn, params=params)
                     st.subheader("Results:")
                     st.dataframe(result_df, use_container_width=True)
                     
+                    # Encode the CSV with Arrow's native writer rather than pandas' Python one
+                    csv_buffer = BytesIO()
+                    pacsv.write_csv(pa.Table.from_pandas(result_df, preserve_index=False), csv_buffer)
                     st.download_button(
                         "📥 Download Results (CSV)",
-                        result_df.to_csv(index=False),
+                        csv_buffer.getvalue(),
                         "query_results.csv",
                         "text/csv"
                     )
@@ -834,43 +1002,49 @@ def show_sql_chat(conn):
         **Tables:**
         - `players`: player_id, name, position, team, age, height, weight, years_in_league, draft_year, draft_position
         - `contracts`: contract_id, player_id, team, start_date, end_date, total_value, annual_salary, contract_type
-        - `performance_stats`: stat_id, player_id, season, games_played, minutes_per_game, points_per_game, rebounds_per_game, assists_per_game, field_goal_pct, three_point_pct, free_throw_pct, usage_rate, win_shares, per
+        - `performance_stats`: stat_id, player_id, season, games_played, minutes_per_game, points_per_game, rebounds_per_game, assists_per_game, field_goal_pct, three_point_pct, free_throw_pct, usage_rate, win_shares, per, value_index
         - `injuries`: injury_id, player_id, injury_type, injury_date, return_date, games_missed, recurring
         - `teams`: team_id, team_name, city, conference, division, current_payroll, salary_cap_space, luxury_tax_status
+        
+        **Views:**
+        - `player_value`: player_id, name, team, position, points_per_game, value_index, annual_salary
         """)
 
+# Numbers pulled out of chat questions (amounts, limits, ages)
+_NUM_RE = re.compile(r'\d+')
+
 def translate_natural_to_sql(query):
-    """Simple rule-based translation (replace with LLM in production)"""
+    """Simple rule-based translation (replace with LLM in production)
+    
+    Returns a (sql, params) tuple; values taken from the question are bound as ? parameters.
+    """
     query_lower = query.lower()
     
     # Simple pattern matching
-    if "over" in query_lower and "million" in query_lower or "$" in query_lower:
+    if "over" in query_lower and ("million" in query_lower or "$" in query_lower):
         # Extract amount
-        import re
-        amount = re.findall(r'\d+', query_lower)
+        amount = _NUM_RE.findall(query_lower)
         if amount:
-            amount = amount[0]
-            return f"""
+            return """
                 SELECT p.name, p.position, p.team, c.annual_salary
                 FROM players p
                 JOIN contracts c ON p.player_id = c.player_id
-                WHERE c.annual_salary > {amount}
+                WHERE c.annual_salary > ?
                 ORDER BY c.annual_salary DESC
-            """
+            """, (float(amount[0]),)
     
     elif "top" in query_lower and "scorer" in query_lower:
-        amount = "5"
-        import re
-        nums = re.findall(r'\d+', query_lower)
+        amount = 5
+        nums = _NUM_RE.findall(query_lower)
         if nums:
-            amount = nums[0]
-        return f"""
+            amount = int(nums[0])
+        return """
             SELECT p.name, p.team, ps.points_per_game
             FROM players p
             JOIN performance_stats ps ON p.player_id = ps.player_id
             ORDER BY ps.points_per_game DESC
-            LIMIT {amount}
-        """
+            LIMIT ?
+        """, (amount,)
     
     elif "recurring" in query_lower and "injur" in query_lower:
         return """
@@ -878,7 +1052,7 @@ def translate_natural_to_sql(query):
             FROM players p
             JOIN injuries i ON p.player_id = i.player_id
             WHERE i.recurring = 1
-        """
+        """, ()
     
     elif "average salary" in query_lower and "position" in query_lower:
         return """
@@ -887,23 +1061,21 @@ def translate_natural_to_sql(query):
             JOIN contracts c ON p.player_id = c.player_id
             GROUP BY p.position
             ORDER BY avg_salary DESC
-        """
+        """, ()
     
     elif "point guard" in query_lower and "under" in query_lower:
-        import re
-        age = re.findall(r'\d+', query_lower)
+        age = _NUM_RE.findall(query_lower)
         if age:
-            age = age[0]
-            return f"""
+            return """
                 SELECT p.name, p.age, p.team, ps.points_per_game, ps.assists_per_game
                 FROM players p
                 JOIN performance_stats ps ON p.player_id = ps.player_id
-                WHERE p.position = 'PG' AND p.age < {age}
+                WHERE p.position = 'PG' AND p.age < ?
                 ORDER BY ps.assists_per_game DESC
-            """
+            """, (int(age[0]),)
     
     # Default fallback
-    return "SELECT * FROM players LIMIT 10"
+    return "SELECT * FROM players LIMIT 10", ()
 
 # ============================================================================
 # RUN APP